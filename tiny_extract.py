@@ -48,7 +48,12 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 import csv
 import os
+import struct
 import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
 from os.path import abspath, dirname, exists, join
 
 SCRIPTS_DIR = join(dirname(dirname(abspath(__file__))), "utils", "scripts")
@@ -58,11 +63,13 @@ if not exists(SCRIPTS_DIR):
 sys.path.append(SCRIPTS_DIR)
 
 from mc import download_mojang_file
-from jawa.classloader import ClassLoader
 import tempfile
 
 OUT_DIR = join(dirname(abspath(__file__)), "tiny_v1s")
 
+# Descriptor maps keyed by Minecraft version, so each jar is only decoded once
+_DESC_CACHE: dict[str, tuple] = {}
+
 
 class TinyV1Writer:
     def __init__(self, namespaces):
@@ -71,103 +78,190 @@ class TinyV1Writer:
         "named"])
         """
         self.namespaces = namespaces
-        self.lines = [f"v1\t" + "\t".join(namespaces)]
+        self.buf = bytearray()
+        self.buf += ("v1\t" + "\t".join(namespaces) + "\n").encode("utf-8")
 
     def add_class(self, *names):
         """Add a class mapping across namespaces"""
-        self.lines.append("CLASS\t" + "\t".join(names))
+        self.buf += ("CLASS\t" + "\t".join(names) + "\n").encode("utf-8")
 
     def add_field(self, owner, desc, *names):
         """Add a field mapping"""
-        self.lines.append("FIELD\t" + "\t".join([owner, desc] + list(names)))
+        self.buf += (
+            "FIELD\t" + "\t".join((owner, desc) + names) + "\n"
+        ).encode("utf-8")
 
     def add_method(self, owner, desc, *names):
         """Add a method mapping"""
-        self.lines.append("METHOD\t" + "\t".join([owner, desc] + list(names)))
+        self.buf += (
+            "METHOD\t" + "\t".join((owner, desc) + names) + "\n"
+        ).encode("utf-8")
 
     def write(self, path):
-        with open(path, "w", encoding="utf-8") as f:
-            f.write("\n".join(self.lines) + "\n")
+        with open(path, "wb") as f:
+            f.write(self.buf)
 
 
-def build_descriptor_map_jar(jar_path: str):
+# Sizes of the constant pool entries we never need to look at, by tag
+_CP_SIZES = {
+    3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4,
+    15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2,
+}
+
+
+def _mutf8(raw: bytes) -> str:
+    """Decode a constant pool string (JVM "modified" UTF-8)"""
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+
+
+def _fast_descmap(zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """
+    Build {(className, fieldOrMethodName(+func)): descriptor} for a single
+    .class entry.
+
+    Only the UTF-8 constants and the field/method tables are looked at,
+    everything else (attributes, code, other constants) is skipped over.
     """
-    Build {className: {fieldOrMethodName(+func): descriptor}} from the
-    obfuscated jar. Keys are JVM internal names (slashes, e.g. kd, ko$1,
+    class_name = sys.intern(info.filename[:-6])
+    data = zf.read(info)
+
+    utf8 = {}
+    (cp_count,) = struct.unpack_from(">H", data, 8)
+    pos = 10
+    i = 1
+    while i < cp_count:
+        tag = data[pos]
+        if tag == 1:
+            (length,) = struct.unpack_from(">H", data, pos + 1)
+            utf8[i] = data[pos + 3 : pos + 3 + length]
+            pos += 3 + length
+        else:
+            pos += 1 + _CP_SIZES[tag]
+            # Longs and doubles take up two slots
+            if tag == 5 or tag == 6:
+                i += 1
+        i += 1
+
+    # Skip access_flags, this_class, super_class and the interfaces
+    (interfaces_count,) = struct.unpack_from(">H", data, pos + 6)
+    pos += 8 + 2 * interfaces_count
+
+    class_map = {}
+    for suffix in ("", "+func"):
+        (count,) = struct.unpack_from(">H", data, pos)
+        pos += 2
+        for _ in range(count):
+            _, name_idx, desc_idx, attrs_count = struct.unpack_from(">HHHH", data, pos)
+            pos += 8
+            for _ in range(attrs_count):
+                (length,) = struct.unpack_from(">I", data, pos + 2)
+                pos += 6 + length
+            name = _mutf8(utf8[name_idx]) + suffix
+            class_map[(class_name, name)] = sys.intern(_mutf8(utf8[desc_idx]))
+
+    return class_map
+
+
+def build_descriptor_map_zip(zf: zipfile.ZipFile):
+    """
+    Build {(className, fieldOrMethodName(+func)): descriptor} from an already
+    opened obfuscated jar, along with the set of all class names in it. Class
+    names are JVM internal names (slashes, e.g. kd, ko$1,
     net/minecraft/SomeClass).
+
+    Every class is read through the given handle, so the central directory
+    is only parsed once. The caller is responsible for closing it.
     """
     desc_map = {}
-    loader = ClassLoader(jar_path)
+    classes = set()
+    for info in zf.infolist():
+        if info.filename.endswith(".class"):
+            classes.add(sys.intern(info.filename[:-6]))
+            desc_map.update(_fast_descmap(zf, info))
 
-    for class_name in loader.classes:
-        jclass = loader[class_name]
-        inner_map = {}
-        for entry in jclass.fields:
-            inner_map[entry.name.value] = entry.descriptor.value
-        for entry in jclass.methods:
-            inner_map[entry.name.value + "+func"] = entry.descriptor.value
-        desc_map[class_name] = inner_map
+    return desc_map, classes
 
-    return desc_map
 
+def build_descriptor_map_jar(jar_path: str):
+    """
+    Same as build_descriptor_map_zip, but opens (and closes) the jar itself.
+    """
+    with zipfile.ZipFile(jar_path) as zf:
+        return build_descriptor_map_zip(zf)
 
-def build_descriptor_map_moj(mc_ver: str, mc_dir : str):
+
+def download_jar(mc_ver: str, mc_dir: str):
     """
-    Downloads the obfuscated Minecraft client jar for a given version and
-    builds the descriptor map.
+    Downloads the obfuscated Minecraft client jar for a given version into
+    mc_dir, unless it is already there. Returns the path to the jar.
     """
     jar_path = join(mc_dir, mc_ver + ".jar")
 
     if not exists(jar_path):
         download_mojang_file(mc_ver, "client", jar_path)
-    desc_map = build_descriptor_map_jar(jar_path)
-    return desc_map
+    return jar_path
+
+
+def build_descriptor_map_moj(mc_ver: str, mc_dir : str):
+    """
+    Downloads the obfuscated Minecraft client jar for a given version and
+    builds the descriptor map and class set. Results are cached per version.
+    """
+    if mc_ver in _DESC_CACHE:
+        return _DESC_CACHE[mc_ver]
+
+    result = build_descriptor_map_jar(download_jar(mc_ver, mc_dir))
+    _DESC_CACHE[mc_ver] = result
+    return result
 
 
 def revengpack_format(
     mc_ver: str, mc_dir : str, config_path: str, out_path: str, do_warnings: bool = True
 ):
-    desc_map = build_descriptor_map_moj(mc_ver, mc_dir)
+    if exists(out_path):
+        return
+
+    desc_map, classes = build_descriptor_map_moj(mc_ver, mc_dir)
     os.makedirs(dirname(out_path), exist_ok=True)
 
     out = TinyV1Writer(["official", "named"])
 
     with open(join(config_path, "minecraft.rgs"), "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    for line in lines:
-        line = line.strip()
+        for line in f:
+            tag, _, rest = line.strip().partition(" ")
 
-        if line.startswith(".class_map"):
-            _, off, named = line.split(" ")
-            out.add_class(off, named)
+            if tag == ".class_map":
+                off, named = rest.split(" ")
+                out.add_class(off, named)
 
-        elif line.startswith(".method_map"):
-            _, off, desc, named = line.split(" ")
-            owner = "/".join(off.split("/")[:-1])
-            off_name = off.split("/")[-1]
-            out.add_method(owner, desc, off_name, named)
+            elif tag == ".method_map":
+                off, desc, named = rest.split(" ")
+                owner, _, off_name = off.rpartition("/")
+                out.add_method(owner, desc, off_name, named)
 
-        elif line.startswith(".field_map"):
-            _, off, named = line.split(" ")
-            owner = "/".join(off.split("/")[:-1])
-            off_name = off.split("/")[-1]
+            elif tag == ".field_map":
+                off, named = rest.split(" ")
+                owner, _, off_name = off.rpartition("/")
+                owner = sys.intern(owner)
 
-            if owner not in desc_map:
-                if do_warnings:
-                    print(f"WARNING: {owner} not found in provided jar")
-                continue
+                if owner not in classes:
+                    if do_warnings:
+                        print(f"WARNING: {owner} not found in provided jar")
+                    continue
 
-            owner_descs = desc_map[owner]
-            if off_name not in owner_descs:
-                if do_warnings:
-                    print(f"WARNING: field {named} cannot be resolved in {owner}/")
-                continue
+                desc = desc_map.get((owner, off_name))
+                if desc is None:
+                    if do_warnings:
+                        print(f"WARNING: field {named} cannot be resolved in {owner}/")
+                    continue
 
-            out.add_field(owner, owner_descs[off_name], off_name, named)
+                out.add_field(owner, desc, off_name, named)
 
-        elif line.startswith("### GENERATED MAPPINGS:"):
-            break
+            elif tag == "###" and rest.startswith("GENERATED MAPPINGS:"):
+                break
 
     out.write(out_path)
 
@@ -185,38 +279,45 @@ def alpha_csv_format(
                             multiple versions. This param selects the version
                             to use
     """
-    desc_map = build_descriptor_map_moj(mc_ver, mc_dir)
+    if exists(out_path):
+        return
+
+    desc_map, classes = build_descriptor_map_moj(mc_ver, mc_dir)
     os.makedirs(dirname(out_path), exist_ok=True)
 
     out = TinyV1Writer(["official", "intermediary", "named"])
 
     with open(join(config_path, "classes.csv"), "r", encoding="utf-8") as f:
         clsreader = iter(csv.reader(f, delimiter=",", quotechar='"'))
+        get_cls = itemgetter(classes_version, 0)
 
         # Skip headers
         for _ in range(4):
             next(clsreader)
 
         for entry in clsreader:
-            if entry[classes_version] == "*":
+            cls, named_name = get_cls(entry)
+            if cls == "*":
                 continue
-            out.add_class(entry[classes_version], entry[classes_version], entry[0])
+            out.add_class(cls, cls, named_name)
 
     # Build intermediary maps first
     method_map = {}
     field_map = {}
     with open(join(config_path, "minecraft.rgs"), "r", encoding="utf-8") as f:
-        for l in f.readlines():
-            l = l.strip()
-            if l.startswith(".method_map"):
-                _, off_name, desc, inter = l.split(" ")
-                method_map[inter] = [off_name, desc]
-            if l.startswith(".field_map"):
-                _, off_name, inter = l.split(" ")
+        for line in f:
+            tag, _, rest = line.strip().partition(" ")
+            if tag == ".method_map":
+                off_name, desc, inter = rest.split(" ")
+                method_map[inter] = (off_name, desc)
+            elif tag == ".field_map":
+                off_name, inter = rest.split(" ")
                 field_map[inter] = off_name
 
     with open(join(config_path, "fields.csv"), "r", encoding="utf-8") as f:
         fieldreader = iter(csv.reader(f, delimiter=",", quotechar='"'))
+        get_field = itemgetter(2, 6)
+        members_by_cls = None
 
         # Skip headers
         for _ in range(3):
@@ -226,12 +327,10 @@ def alpha_csv_format(
             if len(entry) < 7:
                 continue
 
-            inter_name = entry[2]
+            inter_name, named_name = get_field(entry)
             if inter_name == "*":
                 continue
 
-            named_name = entry[6]
-
             if inter_name not in field_map:
                 if do_warnings:
                     print(
@@ -241,44 +340,47 @@ def alpha_csv_format(
                 continue
 
             off_path = field_map[inter_name]
-            off_cls = "/".join(off_path.split("/")[:-1])
-            off_name = off_path.split("/")[-1]
+            off_cls, _, off_name = off_path.rpartition("/")
+            off_cls = sys.intern(off_cls)
 
-            if off_cls not in desc_map:
+            if off_cls not in classes:
                 if do_warnings:
                     print(f"WARNING: {off_cls} not found in provided jar")
                 continue
 
-            owner_descs = desc_map[off_cls]
-            if off_name not in owner_descs:
+            desc = desc_map.get((off_cls, off_name))
+            if desc is None:
                 if do_warnings:
+                    # Only index members by class once something needs listing
+                    if members_by_cls is None:
+                        members_by_cls = {}
+                        for cls, name in desc_map:
+                            members_by_cls.setdefault(cls, []).append(name)
                     print(
                         f"WARNING: field {off_name} cannot be resolved in {off_cls}: "
-                        f"{list(owner_descs.keys())}"
+                        f"{members_by_cls.get(off_cls, [])}"
                     )
                 continue
 
-            out.add_field(
-                off_cls, owner_descs[off_name], off_name, inter_name, named_name
-            )
+            out.add_field(off_cls, desc, off_name, inter_name, named_name)
 
     with open(join(config_path, "methods.csv"), "r", encoding="utf-8") as f:
         methodreader = iter(csv.reader(f, delimiter=",", quotechar='"'))
+        get_method = itemgetter(1, 4)
 
         # Skip headers
         for _ in range(4):
             next(methodreader)
 
         for entry in methodreader:
-            entry = [e.strip() for e in entry]
-
             if len(entry) < 5:
                 continue
-            if entry[1] == "*" or len(entry[1]) == 0:
-                continue
 
-            inter_name = entry[1]
-            named_name = entry[4]
+            inter_name, named_name = get_method(entry)
+            inter_name = inter_name.strip()
+            if inter_name == "*" or len(inter_name) == 0:
+                continue
+            named_name = named_name.strip()
 
             assert named_name != "*", "Mapping issue"
 
@@ -291,8 +393,7 @@ def alpha_csv_format(
                 continue
 
             off_path, o_desc = method_map[inter_name]
-            off_cls = "/".join(off_path.split("/")[:-1])
-            off_name = off_path.split("/")[-1]
+            off_cls, _, off_name = off_path.rpartition("/")
 
             out.add_method(off_cls, o_desc, off_name, inter_name, named_name)
 
@@ -335,14 +436,35 @@ STYLE_OLD_ALPHA = [
     {"ver": "a1.2.6", "sub": "mcp25", "mcver": "a1.2.6", "out": "a1.2.6-mcp25", "classes_version": 2},
 ]
 
+def _out_path(cfg):
+    outf = f'{cfg["sub"] if not "out" in cfg else cfg["out"]}.tiny'
+    return join(OUT_DIR, cfg["ver"], outf)
+
+
 def generate_all_tiny(do_warnings):
+    try:
+        _generate_all_tiny(do_warnings)
+    finally:
+        _DESC_CACHE.clear()
+
+
+def _generate_all_tiny(do_warnings):
     with tempfile.TemporaryDirectory() as temp_mc_dir:
+        # Fetch every jar that is still needed up front, the downloads are
+        # independent of each other
+        mc_vers = {
+            cfg["mcver"]
+            for cfg in STYLE_REGENGPACK + STYLE_OLD_ALPHA
+            if not exists(_out_path(cfg))
+        }
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            list(ex.map(partial(download_jar, mc_dir=temp_mc_dir), mc_vers))
+
         for cfg in STYLE_REGENGPACK:
             config_dir = join("configs", cfg["ver"])
             dir_ = join(config_dir, cfg["sub"])
 
-            outf = f'{cfg["sub"] if not "out" in cfg else cfg["out"]}.tiny'
-            out = join(OUT_DIR, cfg["ver"], outf)
+            out = _out_path(cfg)
 
             if exists(out):
                 continue
@@ -353,8 +475,7 @@ def generate_all_tiny(do_warnings):
             config_dir = join("configs", cfg["ver"])
             dir_ = join(config_dir, cfg["sub"])
 
-            outf = f'{cfg["sub"] if not "out" in cfg else cfg["out"]}.tiny'
-            out = join(OUT_DIR, cfg["ver"], outf)
+            out = _out_path(cfg)
 
             if exists(out):
                 continue
@@ -1,43 +1,63 @@
 import os, hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 
 
-def report(file):
-    f = open(file, "r")
-    data = f.read()
-    f.close()
-
-    md5 = hashlib.md5(data.encode("utf-8")).hexdigest()
-
-    classes = 0
-    fields = 0
-    methods = 0
-    for l in data.split("\n"):
-        if l.startswith("CLASS"):
-            classes += 1
-        if l.startswith("FIELD"):
-            fields += 1
-        if l.startswith("METHOD"):
-            methods += 1
-    return md5, classes, fields, methods, len(data.split("\t"))
-
-
-if __name__ == "__main__":
-    for diR in sorted(os.listdir("tiny_v1s")):
-        full_dir = os.path.join("tiny_v1s", diR)
-        print()
-        print(f"{diR}\t\t\t\t\tmd5\t\t\t\t\tclasses\tfields\tmethods\tsize")
-        for file in sorted(os.listdir(full_dir)):
-            full_file = os.path.join(full_dir, file)
-            print("\t" + file + "\t\t" + ( "\t".join(
-                str(e)
-                for e in report(full_file)
-
-            )))
+def _md5(f):
+    if hasattr(hashlib, "file_digest"):  # Python 3.11+
+        return hashlib.file_digest(f, "md5").hexdigest()
 
+    md5 = hashlib.md5()
+    buf = memoryview(bytearray(1 << 16))
+    while n := f.readinto(buf):
+        md5.update(buf[:n])
+    return md5.hexdigest()
 
 
+_CHUNK = 1 << 20
+_PREFIXES = (b"\nCLASS", b"\nFIELD", b"\nMETHOD")
 
 
+def report(file):
+    counts = [0] * len(_PREFIXES)
+    tabs = 0
+    with open(file, "rb") as f:
+        md5 = _md5(f)
+        f.seek(0)
+
+        # Lines are counted by searching for "\n" + prefix in each chunk. The
+        # tail of the previous chunk is carried over (starting with a fake
+        # "\n" for the first line) so matches across chunk boundaries are seen
+        carry = b"\n"
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            tabs += chunk.count(b"\t")
+            buf = carry + chunk
+            for i, prefix in enumerate(_PREFIXES):
+                counts[i] += buf.count(prefix) - carry.count(prefix)
+            carry = buf[-6:]
+
+    classes, fields, methods = counts
+    return md5, classes, fields, methods, tabs + 1
 
 
+if __name__ == "__main__":
+    listing = [
+        (diR, sorted(os.listdir(os.path.join("tiny_v1s", diR))))
+        for diR in sorted(os.listdir("tiny_v1s"))
+    ]
+    files = [
+        os.path.join("tiny_v1s", diR, file) for diR, dir_files in listing
+        for file in dir_files
+    ]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        results = iter(ex.map(report, files))
+
+        for diR, dir_files in listing:
+            print()
+            print(f"{diR}\t\t\t\t\tmd5\t\t\t\t\tclasses\tfields\tmethods\tsize")
+            for file in dir_files:
+                print("\t" + file + "\t\t" + ( "\t".join(
+                    str(e)
+                    for e in next(results)
+
+                )))